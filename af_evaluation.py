@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from read_record import RecordReader, MITDB_RECORDS
+from local_af_detection import detect_af_episodes
+
+AF_RHYTHM = '(AFIB'
+
+
+def to_intervals(episodes, merge_gap=0):
+    """
+    Convert (onset, offset) episodes to a sorted, non-overlapping interval array.
+
+    Args:
+        episodes (list or np.ndarray): (onset, offset) pairs in samples.
+            Pairs containing None are ignored.
+        merge_gap (int): Episodes separated by at most this many samples are merged.
+
+    Returns:
+        np.ndarray: An (n, 2) integer array of [start, end] sample intervals.
+    """
+    episodes = [episode for episode in episodes if None not in episode]
+    if len(episodes) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    intervals = np.asarray(episodes, dtype=np.int64).reshape(-1, 2)
+    intervals = np.sort(intervals, axis=1)
+    intervals = intervals[np.argsort(intervals[:, 0], kind='stable')]
+
+    # A new run starts wherever an interval begins after everything before it ended
+    running_end = np.maximum.accumulate(intervals[:, 1])
+    new_run = np.empty(len(intervals), dtype=bool)
+    new_run[0] = True
+    new_run[1:] = intervals[1:, 0] > running_end[:-1] + merge_gap
+
+    starts = intervals[new_run, 0]
+    ends = np.maximum.reduceat(intervals[:, 1], np.flatnonzero(new_run))
+    return np.column_stack((starts, ends))
+
+
+def reference_intervals(record, rhythm=AF_RHYTHM):
+    """
+    Get the reference intervals of a rhythm from the record's aux annotations.
+
+    Each rhythm annotation holds until the next rhythm annotation or the end
+    of the signal.
+
+    Args:
+        record (Record): The ECG record.
+        rhythm (str): The rhythm annotation to extract, e.g. '(AFIB'.
+
+    Returns:
+        np.ndarray: An (n, 2) integer array of [start, end] sample intervals.
+    """
+    aux = np.asarray(record['aux'], dtype=str)
+    sample = np.asarray(record['sample'], dtype=np.int64)
+    if len(aux) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    aux = np.char.strip(aux, '\x00 ')
+    is_rhythm = np.char.startswith(aux, '(')
+    rhythm_samples = sample[is_rhythm]
+    rhythm_labels = aux[is_rhythm]
+    rhythm_ends = np.append(rhythm_samples[1:], len(record['signal']))
+
+    is_wanted = rhythm_labels == rhythm
+    return to_intervals(np.column_stack((rhythm_samples[is_wanted],
+                                         rhythm_ends[is_wanted])))
+
+
+def overlap_matrix(reference, detected):
+    """
+    Compute the overlap in samples between every reference and detected interval.
+
+    Returns:
+        np.ndarray: A (len(reference), len(detected)) array of overlaps.
+    """
+    starts = np.maximum(reference[:, None, 0], detected[None, :, 0])
+    ends = np.minimum(reference[:, None, 1], detected[None, :, 1])
+    return np.clip(ends - starts, 0, None)
+
+
+def score_intervals(reference, detected, fs):
+    """
+    Score detected AF intervals against reference AF intervals.
+
+    An episode is a hit when it touches at least one episode of the other set.
+    Timing errors are taken between each hit reference episode and the detected
+    episode that overlaps it the most.
+
+    Args:
+        reference (np.ndarray): Sorted (n, 2) reference intervals.
+        detected (np.ndarray): Sorted (m, 2) detected intervals.
+        fs (int): Sampling frequency of the signal.
+
+    Returns:
+        dict: Episode counts, episode sensitivity/PPV, duration-weighted
+        sensitivity/PPV and mean onset/offset errors in seconds.
+    """
+    touches = ((reference[:, None, 0] <= detected[None, :, 1]) &
+               (detected[None, :, 0] <= reference[:, None, 1]))
+    overlap = overlap_matrix(reference, detected)
+
+    ref_hit = touches.any(axis=1)
+    det_hit = touches.any(axis=0)
+    ref_duration = np.sum(reference[:, 1] - reference[:, 0])
+    det_duration = np.sum(detected[:, 1] - detected[:, 0])
+    overlap_duration = np.sum(overlap)
+
+    onset_error = np.array([])
+    offset_error = np.array([])
+    if ref_hit.any():
+        best = np.argmax(np.where(touches, overlap + 1, 0), axis=1)[ref_hit]
+        onset_error = (detected[best, 0] - reference[ref_hit, 0]) / fs
+        offset_error = (detected[best, 1] - reference[ref_hit, 1]) / fs
+
+    return {"reference_episodes": len(reference),
+            "detected_episodes": len(detected),
+            "true_positive_episodes": int(ref_hit.sum()),
+            "false_positive_episodes": int((~det_hit).sum()),
+            "episode_sensitivity": ref_hit.mean() if len(reference) else np.nan,
+            "episode_ppv": det_hit.mean() if len(detected) else np.nan,
+            "reference_duration": ref_duration / fs,
+            "detected_duration": det_duration / fs,
+            "overlap_duration": overlap_duration / fs,
+            "duration_sensitivity": overlap_duration / ref_duration if ref_duration else np.nan,
+            "duration_ppv": overlap_duration / det_duration if det_duration else np.nan,
+            "mean_onset_error": np.abs(onset_error).mean() if len(onset_error) else np.nan,
+            "mean_offset_error": np.abs(offset_error).mean() if len(offset_error) else np.nan}
+
+
+DEFAULT_MERGE_GAP = 2  # seconds, one window of detect_af_episodes
+
+
+def evaluate_record(number, channel=0, detector=detect_af_episodes, merge_gap=DEFAULT_MERGE_GAP):
+    """
+    Read a record, run the AF detector on it and score it against its aux annotations.
+
+    Args:
+        number (str): The name or identifier of the record.
+        channel (int): The channel number of the ECG signal to read.
+        detector (callable): Takes (signal, fs) and returns (onset, offset) episodes.
+        merge_gap (float): Detected episodes closer than this many seconds are merged,
+            so window-wise fragments of one AF run are scored as one episode.
+
+    Returns:
+        dict: The record's scores, see score_intervals.
+    """
+    record = RecordReader.read(number, channel, 0, None)
+    fs = record['sampling_frequency']
+
+    reference = reference_intervals(record)
+    detected = to_intervals(detector(record['signal'], fs), merge_gap=int(merge_gap * fs))
+
+    scores = {"record": number}
+    scores.update(score_intervals(reference, detected, fs))
+    return scores
+
+
+def evaluate_records(numbers=MITDB_RECORDS, channel=0, detector=detect_af_episodes,
+                     merge_gap=DEFAULT_MERGE_GAP, max_workers=None):
+    """
+    Score the AF detector over many records in parallel.
+
+    Args:
+        numbers (list): Record names to evaluate.
+        channel (int): The channel number of the ECG signal to read.
+        detector (callable): A picklable function taking (signal, fs).
+        merge_gap (float): Detected episodes closer than this many seconds are merged.
+        max_workers (int): Number of worker processes, defaults to the CPU count.
+
+    Returns:
+        pd.DataFrame: One row of scores per record.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(evaluate_record, number, channel, detector, merge_gap)
+                   for number in numbers]
+        scores = [future.result() for future in futures]
+
+    return pd.DataFrame(scores).set_index("record")
+
+
+def summarize_scores(scores):
+    """
+    Pool per-record scores into gross (database-wide) statistics.
+
+    Args:
+        scores (pd.DataFrame): Output of evaluate_records.
+
+    Returns:
+        dict: Gross episode and duration sensitivity/PPV.
+    """
+    reference_episodes = scores['reference_episodes'].sum()
+    detected_episodes = scores['detected_episodes'].sum()
+    true_positives = scores['true_positive_episodes'].sum()
+    false_positives = scores['false_positive_episodes'].sum()
+    overlap_duration = scores['overlap_duration'].sum()
+    reference_duration = scores['reference_duration'].sum()
+    detected_duration = scores['detected_duration'].sum()
+
+    return {"episode_sensitivity": true_positives / reference_episodes if reference_episodes else np.nan,
+            "episode_ppv": (detected_episodes - false_positives) / detected_episodes if detected_episodes else np.nan,
+            "duration_sensitivity": overlap_duration / reference_duration if reference_duration else np.nan,
+            "duration_ppv": overlap_duration / detected_duration if detected_duration else np.nan,
+            "mean_onset_error": scores['mean_onset_error'].mean(),
+            "mean_offset_error": scores['mean_offset_error'].mean()}
+
+
+if __name__ == "__main__":
+    record_scores = evaluate_records()
+    print(record_scores)
+    print(summarize_scores(record_scores))
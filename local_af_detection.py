@@ -49,6 +49,27 @@ def detect_af_in_window(r_peaks, rr_intervals, ecg_signal, window_start_idx, fs)
             if len(p_peak) == 0:  # No P-peak found, potential AF
                 if af_onset is None:
                     af_onset = window_start_idx + r_peak  # Earliest AF onset
-                af_offset = window_start_idx + r_peak  # Latest AF offset
+                af_offset = window_start_idx + next_r_peak  # End of the latest AF beat
     
     return af_onset, af_offset
+
+def detect_af_episodes(ecg_signal, fs, window_width=2):
+    """
+    Run the window-wise AF detector over a whole signal.
+    Returns a list of (onset, offset) sample pairs, one per window with AF.
+    """
+    window_size = int(window_width * fs)
+    episodes = []
+
+    for window_start_idx in range(0, len(ecg_signal) - window_size + 1, window_size):
+        window = ecg_signal[window_start_idx:window_start_idx + window_size]
+        r_peaks = find_r_peaks(window, fs)
+        if len(r_peaks) < 2:
+            continue
+        rr_intervals = calculate_rr_intervals(r_peaks)
+        af_onset, af_offset = detect_af_in_window(r_peaks, rr_intervals, window,
+                                                  window_start_idx, fs)
+        if af_onset is not None:
+            episodes.append((af_onset, af_offset))
+
+    return episodes
@@ -1,12 +1,28 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import wfdb
-import neurokit2 as nk
-import plotly.graph_objects as go
 
-from read_record import Record, RecordReader
-from scanning_window import scan_without_interval
+from read_record import RecordReader, MITDB_RECORDS
+from record_manifest import load_manifest, manifest_mtime, describe_record
+from segment_prefetch import SegmentPrefetcher, build_minute_figure, build_segment_figure
+
+
+@st.cache_data
+def get_manifest(mtime):
+    # Keyed on the file's modification time so a newly generated manifest is loaded
+    return load_manifest()
+
+
+@st.cache_resource(max_entries=3)
+def get_record(number):
+    return RecordReader.read(f"{number}", 0, 0, None)
+
+
+@st.cache_data(max_entries=len(MITDB_RECORDS))
+def get_info(number):
+    # Without a manifest entry, describe the record from the one we have to read anyway
+    return describe_record(number, record=get_record(int(number)))
+
+
+manifest = get_manifest(manifest_mtime())
 
 st.title("Simple ECG Visualizer App")
 st.write("""
@@ -14,8 +30,9 @@ st.write("""
 - This app is designed to work with the MIT-BIH Arrhythmia Database.
 - Please select a record from the dropdown menu to visualize the ECG signal.
 """)
-record_selection = st.selectbox("Select a record", ["100","101","102","103","104","105","106","107","108","109","111","112","113","114","115","116","117","118","119","121","122","123","124","200","201","202","203","204","205","206","207","208","209","210", "211", "212", "213", "214", "215", "216", "217", "218", "219"])
+record_selection = st.selectbox("Select a record", list(manifest.keys()) or MITDB_RECORDS)
 record_name = int(record_selection)
+record_info = manifest.get(record_selection) or get_info(record_selection)
 st.write(f"This is a simple app to visualize ECG signals.\n Here's the record we're using is {record_name} from MIT-BIH Arrhythmia Database.")
 
 # About MIT-BIH Arrhythmias Database
@@ -40,39 +57,47 @@ with st.expander("About MIT-BIH Arrhythmias Database"):
    
     """)
 
-current_record = RecordReader.read(f"{record_name}",0,0,None)
-current_signal = current_record['signal']
-current_annotations=current_record['symbol']
-current_annotated_pt=current_record['sample']
-
 # Calculate the number of samples in one minute
-sampling_rate = current_record['sampling_frequency']
-samples_per_minute = sampling_rate * 60  
+sampling_rate = record_info['fs']
+samples_per_minute = int(sampling_rate * 60)
 
 # Create a slider to select the starting minute
-total_minutes = len(current_signal) // samples_per_minute
+total_minutes = record_info['length'] // samples_per_minute
 start_minute = st.slider("Select starting minute", 0, total_minutes - 1, 0)
 
 # Calculate the start and end indices for the selected minute
 start_index = start_minute * samples_per_minute
 end_index = start_index + samples_per_minute
 
+# Summarize the record before reading its signal
+st.write(f"""
+**Record summary:**
+- Label: {record_info['label'] or 'not given'}
+- Channels: {', '.join(record_info['channels'])}
+- Sampling rate: {sampling_rate} Hz
+- Contains PAC: {'yes' if record_info['has_pac'] else 'no'}, contains PVC: {'yes' if record_info['has_pvc'] else 'no'}
+- Rhythm types: {', '.join(record_info['rhythm_types']) or 'none annotated'}
+""")
+
+current_record = get_record(record_name)
+current_signal = current_record['signal']
+current_annotations=current_record['symbol']
+current_annotated_pt=current_record['sample']
+
+# Figures are built ahead of time on a background worker for this session
+if 'prefetcher' not in st.session_state:
+    st.session_state.prefetcher = SegmentPrefetcher()
+prefetcher = st.session_state.prefetcher
+prefetcher.reset(record_name)
+
 # Create the main ECG plot
-fig_ecg = go.Figure()
-fig_ecg.add_trace(go.Scatter(y=current_signal[start_index:end_index], mode='lines', name='ECG Signal'))
-
-# Update layout for the main ECG plot
-fig_ecg.update_layout(
-    title='ECG Signal Visualization',
-    xaxis_title='Sample',
-    yaxis_title='Amplitude',
-    height=500,
-)
+fig_ecg = prefetcher.get(('minute', start_minute), build_minute_figure,
+                         current_signal, start_index, samples_per_minute)
 # Display the main ECG plot
 st.plotly_chart(fig_ecg, use_container_width=True)
 # Display additional information
 st.write(f"Showing  {start_minute + 1}-minute out of {total_minutes} minutes")
-st.write(f"Total signal length: {len(current_signal)} samples")
+st.write(f"Total signal length: {record_info['length']} samples")
 
 segment_length = st.selectbox("Choose the segment length (in seconds)", [2,3,5,10])
 
@@ -97,42 +122,32 @@ with col2:
 segment_start = start_index + st.session_state.segment_index * samples_per_segment
 segment_end = segment_start + samples_per_segment
 
-# Clean the ECG segment
-clean_ecg = nk.ecg_clean(current_signal[segment_start:segment_end], sampling_rate=sampling_rate)
-
-# Create the segment plot with two signals
-fig_segment = go.Figure()
-
-# Plot the original ECG data
-fig_segment.add_trace(go.Scatter(
-    y=current_signal[segment_start:segment_end], 
-    mode='lines', 
-    name='Original ECG',
-    line=dict(color='blue')
-))
-
-# Plot the cleaned ECG data
-fig_segment.add_trace(go.Scatter(
-    y=clean_ecg, 
-    mode='lines', 
-    name='Cleaned ECG',
-    line=dict(color='red')
-))
-
-# Update layout for the segment plot
-fig_segment.update_layout(
-    title=f'{segment_length}-Second Segment Visualization (Segment {st.session_state.segment_index + 1}/{num_segments})',
-    xaxis_title='Sample',
-    yaxis_title='Amplitude',
-    height=400,
-    showlegend=True,
-    legend=dict(
-        yanchor="top",
-        y=0.99,
-        xanchor="left",
-        x=0.01
-    )
-)
+# Clean the ECG segment and create the segment plot with two signals
+segment_index = st.session_state.segment_index
+fig_segment = prefetcher.get(('segment', start_minute, segment_length, segment_index),
+                             build_segment_figure, current_signal, segment_start,
+                             samples_per_segment, sampling_rate, segment_length,
+                             segment_index, num_segments)
+
+# Prefetch the previous and next segments, and the next minute near its boundary
+neighbours = [(start_minute, (segment_index + 1) % num_segments),
+              (start_minute, (segment_index - 1) % num_segments)]
+if segment_index == num_segments - 1 and start_minute + 1 < total_minutes:
+    neighbours.append((start_minute + 1, segment_index))
+
+wanted = set()
+for minute, index in neighbours:
+    key = ('segment', minute, segment_length, index)
+    wanted.add(key)
+    prefetcher.prefetch(key, build_segment_figure, current_signal,
+                        minute * samples_per_minute + index * samples_per_segment,
+                        samples_per_segment, sampling_rate, segment_length,
+                        index, num_segments)
+    if minute != start_minute:
+        wanted.add(('minute', minute))
+        prefetcher.prefetch(('minute', minute), build_minute_figure,
+                            current_signal, minute * samples_per_minute, samples_per_minute)
+prefetcher.cancel_stale(wanted)
 
 # Add a note about the signals
 st.write("""
@@ -1,9 +1,14 @@
 import os
-import wfdb
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+
+MITDB_RECORDS = ["100", "101", "102", "103", "104", "105", "106", "107", "108", "109",
+                 "111", "112", "113", "114", "115", "116", "117", "118", "119", "121",
+                 "122", "123", "124", "200", "201", "202", "203", "205", "207", "208",
+                 "209", "210", "212", "213", "214", "215", "217", "219", "220", "221",
+                 "222", "223", "228", "230", "231", "232", "233", "234"]
 
 class Record:
     
@@ -210,7 +215,7 @@ class RecordReader:
     """Class for reading ECG records."""
     
     @classmethod
-    def read(cls, number, channel, sampfrom, sampto):
+    def read(cls, number, channel, sampfrom, sampto, target_fs=None):
         
         """
         Read an ECG record.
@@ -225,6 +230,8 @@ class RecordReader:
             channel (int): The channel number of the ECG signal to read.
             sampfrom (int): Starting sample index to read.
             sampto (int): Ending sample index to read.
+            target_fs (int): Sampling frequency to resample the record to.
+                The native rate is kept if None.
 
         Returns:
             Record: A Record object representing the ECG record.
@@ -236,40 +243,102 @@ class RecordReader:
         
         
         
-        signal = wfdb.rdrecord(record_name=f"{number}",
+        import wfdb
+
+        record = wfdb.rdrecord(record_name=f"{number}",
                                pn_dir='mitdb',
                                sampfrom=sampfrom,
-                               sampto=sampto).p_signal[:, channel]
+                               sampto=sampto)
+        signal = record.p_signal[:, channel]
         
         ann = wfdb.rdann(record_name=f"{number}", pn_dir='mitdb',extension='atr',shift_samps=True,sampfrom=sampfrom,sampto=sampto)
         
         symbol = ann.symbol
         aux = ann.aux_note
         sample = ann.sample
-        if wfdb.rdrecord(record_name=f"{number}",pn_dir='mitdb').comments:
-            if wfdb.rdrecord(record_name=f"{number}",pn_dir='mitdb').comments[0]=='non atrial fibrillation' :
-                comment=wfdb.rdrecord(record_name=f"{number}",pn_dir='mitdb').comments[0]
-            elif wfdb.rdrecord(record_name=f"{number}",pn_dir='mitdb').comments[0]=='atrial fibrillation' :
-                comment=wfdb.rdrecord(record_name=f"{number}",pn_dir='mitdb').comments[0]
-            else:
-                comment=[]
-                
+        if record.comments and record.comments[0] in ('non atrial fibrillation',
+                                                      'atrial fibrillation'):
+            comment=record.comments[0]
         else:
             comment=[]
-        sf = wfdb.rdrecord(record_name=f"{number}",
-                               pn_dir='mitdb').fs
+        sf = record.fs
+        
+        record = Record(parent=number,
+                        signal=signal,
+                        symbol=symbol,
+                        aux=aux,
+                        sample=sample,
+                        label=comment,
+                        sf=sf)
+        
+        if target_fs is not None:
+            record = resample_record(record, target_fs)
         
-        return Record(parent=number,
-                      signal=signal,
-                      symbol=symbol,
-                      aux=aux,
-                      sample=sample,
-                      label=comment,
-                      sf=sf)
+        return record
+
+
+@lru_cache(maxsize=None)
+def design_resampling_filter(up, down):
+    """
+    Design the anti-aliasing FIR filter used to resample by up/down.
+
+    This is the same Kaiser-windowed low-pass filter scipy.signal.resample_poly
+    designs by default, kept so it is only designed once per rate pair.
+
+    Args:
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+
+    Returns:
+        np.ndarray: The filter coefficients.
+    """
+    from scipy.signal import firwin
+    
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return firwin(2 * half_len + 1, 1. / max_rate, window=('kaiser', 5.0))
+
+
+def resample_record(record, target_fs):
+    """
+    Resample a record to target_fs with rational polyphase resampling.
+
+    Annotation sample indices are rescaled to the new rate so that they keep
+    pointing at the same beats.
+
+    Args:
+        record (Record): The ECG record to resample.
+        target_fs (int): The sampling frequency to resample to.
+
+    Returns:
+        Record: A new Record at target_fs, or the same record if it is already there.
+    """
+    from scipy.signal import resample_poly
+    
+    sf = record['sampling_frequency']
+    if target_fs == sf:
+        return record
+    
+    ratio = (Fraction(target_fs) / Fraction(sf)).limit_denominator(1000)
+    up, down = ratio.numerator, ratio.denominator
+    
+    signal = resample_poly(record['signal'], up, down,
+                           window=design_resampling_filter(up, down))
+    sample = np.asarray(record['sample'], dtype=np.int64)
+    sample = np.clip(np.round(sample * up / down).astype(np.int64), 0, len(signal) - 1)
+    
+    return Record(parent=record.which(),
+                  signal=signal,
+                  symbol=record['symbol'],
+                  aux=record['aux'],
+                  sample=sample,
+                  label=record['label'],
+                  sf=target_fs)
 
 
 def plot_signal_with_annotation(signal,annotation_symbols,annotation_indices,
                                 sampling_freq,ann_style='r.',figsize=(15,6)):
+    import matplotlib.pyplot as plt
         
     #create time axis
     time=np.arange(len(signal))/sampling_freq
@@ -0,0 +1,106 @@
+import os
+import json
+
+from read_record import MITDB_RECORDS
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_manifest.json")
+
+
+def describe_record(number, record=None):
+    """
+    Collect the metadata of a record from its header and annotations only.
+
+    No signal samples are read, so this is much cheaper than RecordReader.read.
+
+    Args:
+        number (str): The name or identifier of the record.
+        record (Record): An already read full record whose annotations are
+            reused instead of fetching them again.
+
+    Returns:
+        dict: fs, length, channels, label, has_pac, has_pvc, has_unknown_beat,
+        has_missed_beat and rhythm_types of the record.
+    """
+    import wfdb
+
+    header = wfdb.rdheader(record_name=f"{number}", pn_dir='mitdb')
+    if record is None:
+        ann = wfdb.rdann(record_name=f"{number}", pn_dir='mitdb', extension='atr')
+        symbol, aux_note = ann.symbol, ann.aux_note
+    else:
+        symbol, aux_note = record['symbol'], record['aux']
+
+    label = []
+    if header.comments and header.comments[0] in ('non atrial fibrillation',
+                                                  'atrial fibrillation'):
+        label = header.comments[0]
+
+    symbols = set(symbol)
+    rhythm_types = sorted({aux.strip('\x00 ') for aux in aux_note
+                           if aux.startswith('(')})
+
+    return {"fs": header.fs,
+            "length": header.sig_len,
+            "channels": header.sig_name,
+            "label": label,
+            "has_pac": "A" in symbols,
+            "has_pvc": "V" in symbols,
+            "has_unknown_beat": "Q" in symbols,
+            "has_missed_beat": '"' in symbols,
+            "rhythm_types": rhythm_types}
+
+
+def build_manifest(numbers=MITDB_RECORDS, path=MANIFEST_PATH):
+    """
+    Describe every record and write the manifest to a JSON file.
+
+    Args:
+        numbers (list): Record names to include.
+        path (str): Where to write the manifest.
+
+    Returns:
+        dict: The manifest, keyed by record name.
+    """
+    manifest = {f"{number}": describe_record(number) for number in numbers}
+    try:
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=1)
+        print(f"Wrote manifest to {path}")
+    except OSError as error:
+        print(f"Warning: could not write manifest to {path}: {error}")
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load the precomputed record manifest.
+
+    Args:
+        path (str): Location of the manifest JSON file.
+
+    Returns:
+        dict: The manifest, keyed by record name. Empty if it has not been
+        precomputed or cannot be read.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as error:
+        print(f"Warning: could not load manifest from {path}: {error}")
+        return {}
+
+
+def manifest_mtime(path=MANIFEST_PATH):
+    """
+    Get the modification time of the manifest, or None if it does not exist.
+
+    Used as a cache key so a manifest generated later is picked up.
+    """
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    build_manifest()
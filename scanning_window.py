@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
-import neurokit2 as nk
 from collections import Counter
 from sys import stdin, stdout
 
+from read_record import resample_record
+from signal_quality import apply_quality_gate
+
 def calculate_bpm(signal, sampfreq) -> int:
     """
     Calculate the heart rate in beats per minute (BPM) from an ECG signal.
@@ -15,6 +17,8 @@ def calculate_bpm(signal, sampfreq) -> int:
     Returns:
     - int: Heart rate in BPM.
     """
+    import neurokit2 as nk
+
     ecg_signal = signal
     sampfreq = sampfreq
 
@@ -26,7 +30,23 @@ def calculate_bpm(signal, sampfreq) -> int:
 
     return int(heart_rate)
 
-def scan_record(record, window_width, window_step=None):
+def scan_record(record, window_width, window_step=None, target_fs=None, quality_gate=None):
+    """
+    Cut a record into labelled windows.
+
+    Parameters:
+    - record : Record to scan
+    - window_width : width of a window in seconds
+    - target_fs : resample the record to this rate first, if given
+    - quality_gate : 'annotate' to add quality indexes to each window,
+      'drop' to also remove the noisy windows, None to skip the check
+
+    Returns:
+    - pd.DataFrame: one row per window.
+    """
+    
+    if target_fs is not None:
+        record = resample_record(record, target_fs)
     
     rhythm_annotation = record._Record__aux
 
@@ -40,6 +60,12 @@ def scan_record(record, window_width, window_step=None):
         print(f"There's rhythm annotation. {rhythm_keys} in {record._Record__parent}")
         data_within_window=scan_with_interval(record=record,window_width=window_width)
         
+    if quality_gate is not None:
+        if record['has_unknown_beat'] or record['has_missed_beat']:
+            print(f"Record {record._Record__parent} has 'Q' or '\"' annotations.")
+        data_within_window = apply_quality_gate(data_within_window,
+                                                record._Record__sf,
+                                                drop=(quality_gate == 'drop'))
 
     return data_within_window
 
@@ -162,44 +188,32 @@ def scan_with_interval(record, window_width):
         label=interval_name
         # Ensure valid_interval is array-like
         if isinstance(valid_interval, (list, tuple)) and len(valid_interval) > 0:
-                      
-            for interval in valid_interval:                        
-                left_end = interval[0]                
-                right_end = left_end+(window_width * sampfreq)            
+            
+            signal = record._Record__signal
+            sample = np.asarray(record._Record__sample)
+            symbol = record._Record__symbol
+            width = int(window_width * sampfreq)
+            
+            for interval in valid_interval:
+                # Windows step by one heart cycle while they fit in the interval
+                if interval[1] - interval[0] < width:
+                    continue
+                n_windows = (interval[1] - interval[0] - width) // window_step + 1
+                left_ends = interval[0] + window_step * np.arange(n_windows)
+                right_ends = left_ends + width
+                
+                first, last, pac_percent, pvc_percent, classes = label_windows(
+                    sample, symbol, left_ends, right_ends, label)
                 
-                while right_end <= interval[1]:
-                    # Process the interval      
-                    signal_within_window = record._Record__signal[left_end:right_end] 
-                    
-                    annotated_index = np.intersect1d(np.where(left_end <= record._Record__sample),
-                                    np.where(right_end >= record._Record__sample))                                    
-
-                    symbol_within_window = [record._Record__symbol[i] for i in annotated_index]                    
-
-                    sample_within_window = [record._Record__sample[i] - left_end for i in annotated_index]
-                    
-                    # Calculate percentages and true class
-                    beats, count = np.unique(symbol_within_window, return_counts=True)
-                    segment_beat_annotation_count = dict(zip(beats, count))
-                    total_count = sum(segment_beat_annotation_count.values())
-                    if total_count:
-                        pac_percentage = segment_beat_annotation_count.get('A', 0) / total_count * 100
-                        pac_percentages.append(pac_percentage)
-                        pvc_percentage = segment_beat_annotation_count.get('V', 0) / total_count * 100
-                        pvc_percentages.append(pvc_percentage)
-                        
-                        true_class.append(determine_true_class(label,
-                                                            pac_percentage,
-                                                            pvc_percentage)) 
-                                 
-                        ecg_signals.append(signal_within_window)
-                        beat_annotations.append(symbol_within_window)
-                        beat_annotated_points.append(sample_within_window)
-                        
-
-                    #left_end += int(window_width * sampfreq)     
-                    left_end = left_end + window_step               
-                    right_end = left_end + int(window_width * sampfreq)
+                # Windows without any annotation are skipped
+                for i in np.flatnonzero(last > first):
+                    left_end = left_ends[i]
+                    ecg_signals.append(signal[left_end:right_ends[i]])
+                    beat_annotations.append(list(symbol[first[i]:last[i]]))
+                    beat_annotated_points.append(list(sample[first[i]:last[i]] - left_end))
+                    pac_percentages.append(pac_percent[i])
+                    pvc_percentages.append(pvc_percent[i])
+                    true_class.append(classes[i])
                 
         else:
             # Handle case when valid_interval is not array-like
@@ -257,6 +271,64 @@ def scan_with_interval(record, window_width):
     return data_within
 
 
+def label_windows(sample, symbol, left_ends, right_ends, label):
+    """
+    Label many overlapping windows at once from running annotation counts.
+
+    Running counts of all, 'A' and 'V' annotations are kept over the sorted
+    annotation samples, so the count inside each window is the difference of
+    the counts at the annotations entering and leaving it. The cost is linear
+    in annotations plus windows, however much the windows overlap.
+
+    Parameters:
+    - sample : sorted annotation sample indices
+    - symbol : annotation symbols, aligned with sample
+    - left_ends, right_ends : window bounds, both inclusive of annotations
+    - label : record or interval label passed to the class rules
+
+    Returns:
+    - tuple: first and one-past-last annotation index of each window,
+      PAC and PVC percentages, and the true class of each window.
+    """
+    symbol = np.asarray(symbol)
+    first = np.searchsorted(sample, left_ends, side='left')
+    last = np.searchsorted(sample, right_ends, side='right')
+
+    running_pac = np.concatenate(([0], np.cumsum(symbol == 'A')))
+    running_pvc = np.concatenate(([0], np.cumsum(symbol == 'V')))
+
+    total_count = last - first
+    pac_count = running_pac[last] - running_pac[first]
+    pvc_count = running_pvc[last] - running_pvc[first]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pac_percentage = pac_count / total_count * 100
+        pvc_percentage = pvc_count / total_count * 100
+
+    true_class = determine_true_classes(label, pac_percentage, pvc_percentage)
+
+    return first, last, pac_percentage, pvc_percentage, true_class
+
+
+def determine_true_classes(label, pac_percentage, pvc_percentage):
+    """
+    Vectorized determine_true_class over arrays of percentages.
+    """
+    pac_percentage = np.asarray(pac_percentage)
+    pvc_percentage = np.asarray(pvc_percentage)
+    non_af = label == 'non atrial fibrillation'
+    no_pac = pac_percentage == 0
+    no_pvc = pvc_percentage == 0
+
+    # Same rules and precedence as determine_true_class
+    return np.select([non_af & no_pac & no_pvc,
+                      non_af & (pac_percentage < 20) & (pvc_percentage < 20),
+                      non_af & (pac_percentage >= 20) & no_pvc,
+                      non_af & no_pac & (pvc_percentage >= 20),
+                      (not non_af) & no_pac & no_pvc],
+                     ['Pure_NSR', 'NSR', 'PAC', 'PVC', 'AF'],
+                     default='Others')
+
 def determine_true_class(label, pac_percentage, pvc_percentage):
     if is_NSR(label, pac_percentage, pvc_percentage):
         if is_pure_NSR(label, pac_percentage, pvc_percentage):
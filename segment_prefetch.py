@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def build_minute_figure(signal, start_index, samples_per_minute):
+    """
+    Build the one-minute ECG plot starting at start_index.
+    """
+    import plotly.graph_objects as go
+
+    fig_ecg = go.Figure()
+    fig_ecg.add_trace(go.Scatter(y=signal[start_index:start_index + samples_per_minute],
+                                 mode='lines', name='ECG Signal'))
+    fig_ecg.update_layout(
+        title='ECG Signal Visualization',
+        xaxis_title='Sample',
+        yaxis_title='Amplitude',
+        height=500,
+    )
+    return fig_ecg
+
+
+def build_segment_figure(signal, segment_start, samples_per_segment, sampling_rate,
+                         segment_length, segment_index, num_segments):
+    """
+    Clean one segment with NeuroKit2 and plot it over the original signal.
+    """
+    import neurokit2 as nk
+    import plotly.graph_objects as go
+
+    segment = signal[segment_start:segment_start + samples_per_segment]
+    clean_ecg = nk.ecg_clean(segment, sampling_rate=sampling_rate)
+
+    fig_segment = go.Figure()
+    fig_segment.add_trace(go.Scatter(
+        y=segment,
+        mode='lines',
+        name='Original ECG',
+        line=dict(color='blue')
+    ))
+    fig_segment.add_trace(go.Scatter(
+        y=clean_ecg,
+        mode='lines',
+        name='Cleaned ECG',
+        line=dict(color='red')
+    ))
+    fig_segment.update_layout(
+        title=f'{segment_length}-Second Segment Visualization (Segment {segment_index + 1}/{num_segments})',
+        xaxis_title='Sample',
+        yaxis_title='Amplitude',
+        height=400,
+        showlegend=True,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01
+        )
+    )
+    return fig_segment
+
+
+class SegmentPrefetcher:
+    """Per-session cache of figures, filled ahead of time by one background worker."""
+
+    def __init__(self, max_entries=8):
+        """
+        Initialize a SegmentPrefetcher object.
+
+        Args:
+            max_entries (int): Number of figures kept before the oldest is dropped.
+        """
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__cache = OrderedDict()
+        self.__context = None
+        self.__max_entries = max_entries
+
+    def reset(self, context):
+        """
+        Drop all cached and pending work if the context (e.g. the record) changed.
+        """
+        if context != self.__context:
+            for future in self.__cache.values():
+                future.cancel()
+            self.__cache.clear()
+            self.__context = context
+
+    def get(self, key, build, *args):
+        """
+        Return the figure for key, building it now if it was not prefetched.
+        """
+        future = self.__cache.get(key)
+        # Waits for prefetched work still running, and rebuilds it if it failed
+        if future is None or future.cancelled() or future.exception() is not None:
+            future = Future()
+            future.set_result(build(*args))
+            self.__cache[key] = future
+        self.__cache.move_to_end(key)
+        self.__trim()
+        return future.result()
+
+    def prefetch(self, key, build, *args):
+        """
+        Queue building the figure for key on the background worker.
+        """
+        future = self.__cache.get(key)
+        if future is None or self.__is_unusable(future):
+            self.__cache[key] = self.__executor.submit(build, *args)
+        self.__trim()
+
+    def cancel_stale(self, keep):
+        """
+        Cancel queued work whose key is no longer wanted.
+        """
+        for key in list(self.__cache):
+            if key not in keep and self.__cache[key].cancel():
+                del self.__cache[key]
+
+    @staticmethod
+    def __is_unusable(future):
+        # Cancelled or failed work is rebuilt rather than served again
+        return future.cancelled() or (future.done() and future.exception() is not None)
+
+    def __trim(self):
+        while len(self.__cache) > self.__max_entries:
+            _, future = self.__cache.popitem(last=False)
+            future.cancel()
@@ -0,0 +1,143 @@
+import numpy as np
+
+MIN_AMPLITUDE_RANGE = 0.1   # mV, anything flatter carries no usable beats
+MAX_AMPLITUDE_RANGE = 9.5   # mV, close to the 10 mV range of the recorder
+CLIPPING_LIMIT = 5.0        # mV, the recorder saturates at +/- half its 10 mV range
+CLIPPING_TOLERANCE = 0.01   # mV, two quantization steps of the 11-bit ADC
+MIN_CLIPPING_RUN = 0.02     # seconds a sample must stay at the limit to count as clipped
+FLAT_BLOCK_DURATION = 0.2   # seconds
+MAX_FLATLINE_FRACTION = 0.5
+MAX_CLIPPING_FRACTION = 0.02
+HIGH_FREQUENCY_CUTOFF = 40  # Hz
+MAX_HIGH_FREQUENCY_RATIO = 0.3
+NOISE_SYMBOLS = ('Q', '"')
+
+
+def signal_columns(data_within_window):
+    """
+    Get the columns of a scanned window table that hold signal samples.
+
+    scan_without_interval and scan_with_interval put the samples in integer
+    named columns followed by named info columns.
+    """
+    return [column for column in data_within_window.columns if isinstance(column, (int, np.integer))]
+
+
+def sustained_runs(mask, min_run):
+    """
+    Keep only the True samples of a 2-D mask that lie in runs of at least
+    min_run consecutive True samples along each row.
+    """
+    n_windows, n_samples = mask.shape
+    if min_run <= 1 or n_samples < min_run:
+        return mask if min_run <= 1 else np.zeros_like(mask)
+
+    # Starts of all-True stretches of length min_run
+    counts = np.concatenate((np.zeros((n_windows, 1), dtype=int),
+                             np.cumsum(mask, axis=1)), axis=1)
+    full = (counts[:, min_run:] - counts[:, :-min_run]) == min_run
+
+    # A sample is covered if one of those stretches started within min_run before it
+    starts = np.concatenate((np.zeros((n_windows, 1), dtype=int),
+                             np.cumsum(full, axis=1)), axis=1)
+    padded = np.concatenate((starts, np.repeat(starts[:, -1:], min_run - 1, axis=1)), axis=1)
+    lower = np.maximum(np.arange(n_samples) - min_run + 1, 0)
+    return (padded[:, np.arange(n_samples) + 1] - starts[:, lower]) > 0
+
+
+def compute_quality_indexes(windows, sampfreq, clip_limit=CLIPPING_LIMIT):
+    """
+    Compute quality indexes for a whole batch of equal-length windows at once.
+
+    Args:
+        windows (np.ndarray): (n_windows, n_samples) array of ECG windows.
+        sampfreq (int): Sampling frequency of the windows.
+        clip_limit (float): Saturation level of the recorder in mV.
+
+    Returns:
+        dict: Arrays of amplitude_range, flatline_fraction, clipping_fraction
+        and high_frequency_ratio, one value per window.
+    """
+    windows = np.asarray(windows, dtype=float)
+    n_windows, n_samples = windows.shape
+
+    amplitude_range = np.ptp(windows, axis=1)
+
+    # Share of short blocks in which the signal does not move at all
+    block = max(int(FLAT_BLOCK_DURATION * sampfreq), 2)
+    n_blocks = n_samples // block
+    if n_blocks:
+        blocks = windows[:, :n_blocks * block].reshape(n_windows, n_blocks, block)
+        flatline_fraction = np.mean(np.ptp(blocks, axis=2) < 1e-6, axis=1)
+    else:
+        flatline_fraction = np.zeros(n_windows)
+
+    # Share of samples held at the recorder's limits for a sustained run
+    at_limit = np.abs(windows) >= clip_limit - CLIPPING_TOLERANCE
+    min_run = max(int(MIN_CLIPPING_RUN * sampfreq), 2)
+    clipping_fraction = np.mean(sustained_runs(at_limit, min_run), axis=1)
+
+    spectrum = np.abs(np.fft.rfft(windows - windows.mean(axis=1, keepdims=True), axis=1)) ** 2
+    frequencies = np.fft.rfftfreq(n_samples, d=1 / sampfreq)
+    total_energy = spectrum.sum(axis=1)
+    high_energy = spectrum[:, frequencies >= HIGH_FREQUENCY_CUTOFF].sum(axis=1)
+    high_frequency_ratio = np.divide(high_energy, total_energy,
+                                     out=np.zeros(n_windows), where=total_energy > 0)
+
+    return {"amplitude_range": amplitude_range,
+            "flatline_fraction": flatline_fraction,
+            "clipping_fraction": clipping_fraction,
+            "high_frequency_ratio": high_frequency_ratio}
+
+
+def apply_quality_gate(data_within_window, sampfreq, drop=True, clip_limit=CLIPPING_LIMIT):
+    """
+    Annotate the windows of a scanned record with quality indexes and
+    optionally drop the unacceptable ones.
+
+    Windows are unacceptable when they are flat, saturated, clipped, dominated
+    by high-frequency noise, or contain 'Q' (unknown) or '"' annotations.
+
+    Args:
+        data_within_window (pd.DataFrame): Output of scan_record.
+        sampfreq (int): Sampling frequency of the windows.
+        drop (bool): Drop unacceptable windows instead of only annotating them.
+        clip_limit (float): Saturation level of the recorder in mV.
+
+    Returns:
+        pd.DataFrame: The windows with quality columns and an 'acceptable' flag.
+    """
+    if data_within_window.empty:
+        return data_within_window
+
+    data_within_window = data_within_window.reset_index(drop=True)
+    windows = data_within_window[signal_columns(data_within_window)].to_numpy()
+    quality = compute_quality_indexes(windows, sampfreq, clip_limit=clip_limit)
+
+    noise_beats = np.array([sum(symbol in NOISE_SYMBOLS for symbol in symbols)
+                            for symbols in data_within_window['beat_annotation_symbols']])
+
+    acceptable = ((quality["amplitude_range"] >= MIN_AMPLITUDE_RANGE) &
+                  (quality["amplitude_range"] <= MAX_AMPLITUDE_RANGE) &
+                  (quality["flatline_fraction"] <= MAX_FLATLINE_FRACTION) &
+                  (quality["clipping_fraction"] <= MAX_CLIPPING_FRACTION) &
+                  (quality["high_frequency_ratio"] <= MAX_HIGH_FREQUENCY_RATIO) &
+                  (noise_beats == 0))
+
+    for name, values in quality.items():
+        data_within_window[name] = values
+    data_within_window['noise_beats'] = noise_beats
+    data_within_window['acceptable'] = acceptable
+
+    flagged = int((~acceptable).sum())
+    share = flagged / len(acceptable) * 100
+
+    if drop:
+        data_within_window = data_within_window[acceptable].reset_index(drop=True)
+        print(f"Quality gate skipped {flagged} of {len(acceptable)} windows "
+              f"({share:.1f}% of downstream compute).")
+    else:
+        print(f"Quality gate flagged {flagged} of {len(acceptable)} windows "
+              f"({share:.1f}%) as unacceptable; none were skipped.")
+
+    return data_within_window